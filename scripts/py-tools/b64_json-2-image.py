@@ -1,52 +1,68 @@
+import binascii
 import json
-import base64
-import re
 import os
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    # orjson（Rust 实现的 SIMD JSON 解析器）未安装时退回标准库 json
+    orjson = None
+
+_JSON_DECODE_ERRORS = (json.JSONDecodeError, orjson.JSONDecodeError) if orjson else (json.JSONDecodeError,)
+
+# 流式解码的块大小，必须是 4 的倍数（4 个 Base64 字符解码出 3 个字节）
+_B64_CHUNK_SIZE = 131072
 
 
 def base64_json_to_image(
-    b64_json_string: str, output_path: str, data_key: str = "b64_json"
+    b64_json_data: bytes, output_path: str, data_key: str = "b64_json"
 ):
     """
-    将包含 Base64 图片数据的 JSON 字符串转换为图片文件。
+    将包含 Base64 图片数据的 JSON 转换为图片文件。
 
-    :param b64_json_string: 包含 Base64 图片数据的 JSON 字符串。
+    :param b64_json_data: 包含 Base64 图片数据的 JSON 原始字节串。
     :param output_path: 保存图片的路径（例如 'output.png'）。
     :param data_key: JSON 中存储 Base64 数据的键名。
     :return: 如果成功返回 True，失败返回 False。
     """
     try:
         # --- 第 1 步: 解析 JSON ---
-        # 将 JSON 字符串解析为 Python 字典
-        data = json.loads(b64_json_string)
+        # 直接对字节串解析，避免先解码成 str 再解析的整份拷贝
+        if orjson is not None:
+            data = orjson.loads(b64_json_data)
+        else:
+            data = json.loads(b64_json_data)
 
-        # 从字典中获取 Base64 字符串
-        base64_string = data[data_key]
+        # 从字典中获取 Base64 字符串并转为 ASCII 字节串
+        base64_bytes = data[data_key].encode("ascii")
 
         # --- 第 2 步: 清理数据 ---
         # 检查并移除可能存在的 Data URI 前缀
         # 例如: "data:image/png;base64,iVBORw0KGgo..."
-        # 使用正则表达式匹配并移除 "data:image/...;base64," 部分
-        base64_string = re.sub(r"^data:image/\w+;base64,", "", base64_string)
-
-        # --- 第 3 步: 解码 Base64 ---
-        # 将 Base64 字符串解码为二进制数据 (bytes)
-        image_data = base64.b64decode(base64_string)
+        # 前缀是固定格式，startswith + 定位第一个逗号即可，无需正则；
+        # 逗号搜索限定在前 64 字节内，畸形超长输入也只花常数时间
+        if base64_bytes.startswith(b"data:"):
+            comma = base64_bytes.find(b",", 5, 64)
+            if comma != -1:
+                base64_bytes = base64_bytes[comma + 1 :]
 
-        # --- 第 4 步: 保存为文件 ---
-        # 以二进制写入模式 ('wb') 打开文件
-        with open(output_path, "wb") as image_file:
-            # 将二进制数据写入文件
-            image_file.write(image_data)
+        # --- 第 3 步: 分块解码并流式写入 ---
+        # 按 4 的倍数切片逐块解码、边解码边写入，峰值内存保持在一个
+        # 块的大小，而不是同时持有整份 Base64 文本和整份二进制数据
+        with open(output_path, "wb", buffering=131072) as image_file:
+            for offset in range(0, len(base64_bytes), _B64_CHUNK_SIZE):
+                chunk = base64_bytes[offset : offset + _B64_CHUNK_SIZE]
+                image_file.write(binascii.a2b_base64(chunk))
 
         print(f"图片成功保存到: {output_path}")
         return True
 
-    except json.JSONDecodeError:
+    except _JSON_DECODE_ERRORS:
         print("错误: 无效的 JSON 字符串。")
     except KeyError:
         print(f"错误: JSON 中找不到键 '{data_key}'。")
-    except base64.binascii.Error:
+    except binascii.Error:
         print("错误: 无效的 Base64 字符串。")
     except IOError as e:
         print(f"错误: 无法写入文件 '{output_path}'。原因: {e}")
@@ -64,8 +80,8 @@ if __name__ == "__main__":
     # 注意：实际数据可能包含 "data:image/png;base64," 这样的前缀
     # 从当前脚本目录读取 base64_image.json 文件
     json_path = os.path.join(os.path.dirname(__file__), "base64_image.json")
-    with open(json_path, "r", encoding="utf-8") as f:
-        example_b64_json = f.read()
+    # read_bytes 一次读完整个文件，原始字节直接交给 JSON 解析器
+    example_b64_json = Path(json_path).read_bytes()
 
     # 指定输出文件名
     output_filename = "saved_image.png"
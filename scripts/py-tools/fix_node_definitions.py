@@ -0,0 +1,429 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import MemoryHandler
+from multiprocessing.util import Finalize
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+
+def _setup_logging(verbose: bool):
+    """
+    配置批量刷新的日志输出。
+
+    每个文件 1~2 条 print 并逐条刷新 stdout，在几千个文件的运行里
+    系统调用和终端刷新会占到可观的墙钟时间；MemoryHandler 攒满 256 条
+    才刷一次 stderr，错误则立即刷出。普通进度信息由 -v 开关控制。
+    """
+    target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(logging.Formatter("%(message)s"))
+    handler = MemoryHandler(256, flushLevel=logging.ERROR, target=target)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO if verbose else logging.WARNING)
+    return handler
+
+
+# 预编译的正则模式（模块级）。
+# fix_node_definition_file 会对成百上千个文件逐一调用，把 re.compile
+# 提升到模块级可以避免每次调用都经过 re 内部缓存查找。
+# 所有待匹配标记都是 ASCII，整条流水线直接在 UTF-8 字节串上运行，
+# 字节偏移即编辑偏移，中文注释不需要任何解码。
+# 所有"纯替换"类改写（第 1~3、7、8 步）注册进同一个命名分组择一模式：
+# 文件只扫描一遍，由 match.lastgroup 充当 pattern id 分发到对应改写。
+# 这些模式都不含反向引用，re 对它们本就是线性匹配
+_RE_MULTI = re.compile(
+    rb"\.version\((?P<version>[^)]+)\)"
+    rb"|\.inputs\(\[(?P<inputs>[^\]]+)\]\)"
+    rb"|\.outputs\(\[(?P<outputs>[^\]]+)\]\)"
+    rb"|(?P<base>let\s+definition\s*=\s*base\?\s*;)"
+    rb'|NodeDefinition::new\(\s*"(?P<new_name>[^"]+)"\s*,\s*"(?P<new_display>[^"]+)"\s*\)'
+)
+_RE_BUILDER_OPTS = re.compile(rb"NodePropertyKindOptions::builder\(\)([^.]*?)(?=\s*[,)])", re.DOTALL)
+_RE_NP_BUILDER = re.compile(rb"NodeProperty::builder\(\)")
+
+# 常量替换模板：分组反向引用由正则引擎展开，不做逐次的 Python 拼接
+_TPL_NEW = rb'NodeDefinition::new("\g<new_name>", "\g<new_display>", Version::new(1, 0, 0))'
+_TPL_BUILDER_OPTS = rb"NodePropertyKindOptions::builder()\1.build()"
+
+
+# 拆分属性列表时唯一需要关心的五种分隔字符
+_RE_SPLIT_DELIMS = re.compile(rb"[][(),]")
+
+
+def _split_top_level(properties_content: bytes) -> list:
+    """
+    按顶层逗号拆分属性列表，忽略嵌套 [] / () 内部的逗号。
+
+    不逐字节迭代：编译好的字符类只在括号和逗号处停留（其余字节由
+    C 级扫描跳过），沿途维护嵌套深度并记下深度为 0 的逗号位置。
+    """
+    splits = []
+    depth = 0
+    for match in _RE_SPLIT_DELIMS.finditer(properties_content):
+        ch = match.group()
+        if ch == b",":
+            if depth == 0:
+                splits.append(match.start())
+        elif ch == b"[" or ch == b"(":
+            depth += 1
+        else:
+            depth -= 1
+
+    items = []
+    start = 0
+    for i in splits:
+        item = properties_content[start:i].strip()
+        if item:
+            items.append(item)
+        start = i + 1
+    item = properties_content[start:].strip()
+    if item:
+        items.append(item)
+    return items
+
+
+_PROPERTIES_TOKEN = b".properties(["
+
+# 快速预检用的标记子串：文件一个都不含时可以直接跳过全部改写步骤
+_SENTINEL_TOKENS = (
+    b".version(",
+    b".inputs(",
+    b".outputs(",
+    b".properties(",
+    b"NodeProperty::builder()",
+    b"NodePropertyKindOptions::builder()",
+    b"NodeDefinition::new(",
+    b"base?",
+)
+
+
+def _rewrite_multi(match) -> bytes:
+    """_RE_MULTI 的分发回调：按命中的分组名决定改写结果。"""
+    kind = match.lastgroup
+    if kind == "version":
+        # 版本改由 NodeDefinition::new 第三个参数提供
+        return b""
+    if kind == "inputs":
+        return b".add_input(%s)" % (match.group("inputs").strip(),)
+    if kind == "outputs":
+        return b".add_output(%s)" % (match.group("outputs").strip(),)
+    if kind == "base":
+        # builder 不再返回 Result
+        return b"let definition = base;"
+    # new_display: NodeDefinition::new("a", "b") 补版本参数
+    return match.expand(_TPL_NEW)
+
+
+def _apply_edits(content: bytes, edits: list) -> bytes:
+    """
+    一次前向重建应用所有 (start, end, replacement) 编辑。
+
+    相比在循环里反复做 `content[:start] + new + content[end:]`（每次都
+    拷贝整个剩余内容，m 处编辑是 O(n*m)），这里每个字节只拷贝一次，
+    且 bytearray 原地扩容，不产生中间碎片列表。
+    """
+    if not edits:
+        return content
+    buf = bytearray()
+    cursor = 0
+    for start, end, replacement in sorted(edits):
+        buf += content[cursor:start]
+        buf += replacement
+        cursor = end
+    buf += content[cursor:]
+    return bytes(buf)
+
+
+def _extract_properties_blocks(content: bytes) -> list:
+    """
+    单遍扫描提取所有 `.properties([...])` 块。
+
+    用 find 在候选之间跳跃，括号配对同样靠 find 在 `[` / `]` 之间跳跃，
+    中间的普通字节完全不经过 Python 层检查（find 是 C 实现的子串搜索）。
+
+    :return: (start, end, items) 元组列表，按出现顺序排列。
+    """
+    blocks = []
+    n = len(content)
+    pos = 0
+    while True:
+        start = content.find(_PROPERTIES_TOKEN, pos)
+        if start == -1:
+            break
+        inner_start = start + len(_PROPERTIES_TOKEN)
+        bracket_count = 1
+        i = inner_start
+        while bracket_count > 0:
+            open_i = content.find(b"[", i)
+            close_i = content.find(b"]", i)
+            if close_i == -1:
+                # 括号不配对，放弃剩余部分，避免产生错误改写
+                return blocks
+            if open_i != -1 and open_i < close_i:
+                bracket_count += 1
+                i = open_i + 1
+            else:
+                bracket_count -= 1
+                i = close_i + 1
+        end = i
+        if i < n and content[i : i + 1] == b")":
+            end = i + 1
+        blocks.append((start, end, _split_top_level(content[inner_start : i - 1])))
+        pos = end
+    return blocks
+
+
+# 字节串按下标取值得到 int，热循环里直接和这些常量/集合比较
+_IDENT_CHARS = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+_WHITESPACE = b" \t\r\n"
+_DOT = ord(".")
+_LPAREN = ord("(")
+_RPAREN = ord(")")
+
+
+def _find_build_insertion_points(content: bytes) -> list:
+    """
+    一次线性扫描找出所有 NodeProperty::builder() 链末尾需要插入 .build() 的位置。
+
+    长度和内容都提升为局部变量（c / n），扫描热循环里不再每次迭代
+    重新求 len(content)；插入位置收集完后由调用方统一一次重建。
+    """
+    c = content
+    n = len(c)
+    points = []
+    for match in _RE_NP_BUILDER.finditer(c):
+        pos = match.end()
+        chain_end = pos
+        while True:
+            # 跳过链内的空白（Rust 代码经常把每个 .method 单独放一行）
+            probe = pos
+            while probe < n and c[probe] in _WHITESPACE:
+                probe += 1
+            if probe >= n or c[probe] != _DOT:
+                break
+            # 消费 `.method_name(...)`，括号按层计数以支持嵌套调用
+            probe += 1
+            while probe < n and c[probe] in _IDENT_CHARS:
+                probe += 1
+            if probe < n and c[probe] == _LPAREN:
+                paren_count = 1
+                probe += 1
+                while probe < n and paren_count > 0:
+                    ch = c[probe]
+                    if ch == _LPAREN:
+                        paren_count += 1
+                    elif ch == _RPAREN:
+                        paren_count -= 1
+                    probe += 1
+            pos = probe
+            chain_end = probe
+        if not c[match.end() : chain_end].rstrip().endswith(b".build()"):
+            points.append(chain_end)
+    return points
+
+
+def _fix_property_item(item: bytes) -> bytes:
+    """对单个属性表达式局部补齐 builder 链的 .build()（第 5、6 步）。"""
+    item = _RE_BUILDER_OPTS.sub(_TPL_BUILDER_OPTS, item)
+    return _apply_edits(item, [(point, point, b".build()") for point in _find_build_insertion_points(item)])
+
+
+def _collect_edits(content: bytes) -> list:
+    """
+    对原始内容一次性收集全部 8 个改写步骤的 (start, end, replacement) 编辑。
+
+    各阶段不再各自产出一份完整的中间内容（8 个步骤串联时峰值内存约为
+    文件大小的 9 倍），而是统一在原始偏移上记录编辑，最后重建一次。
+    properties 块内部的 builder 修复在 item 局部完成，块外的收集器
+    跳过块内偏移，保证编辑区间互不重叠。
+    """
+    edits = []
+
+    # 第 4 步：properties 块整体替换，item 局部完成第 5、6 步
+    blocks = _extract_properties_blocks(content)
+    block_spans = [(start, end) for start, end, _items in blocks]
+
+    def in_block(pos):
+        return any(start <= pos < end for start, end in block_spans)
+
+    for start, end, items in blocks:
+        replacement = b"".join(b".add_property(%s)" % (_fix_property_item(item),) for item in items)
+        edits.append((start, end, replacement))
+
+    # 第 1~3、7、8 步：合并注册的纯替换改写
+    for match in _RE_MULTI.finditer(content):
+        if not in_block(match.start()):
+            edits.append((match.start(), match.end(), _rewrite_multi(match)))
+
+    # 第 5 步（块外）：NodePropertyKindOptions::builder() 链补 .build()
+    for match in _RE_BUILDER_OPTS.finditer(content):
+        if not in_block(match.start()):
+            edits.append((match.start(), match.end(), match.expand(_TPL_BUILDER_OPTS)))
+
+    # 第 6 步（块外）：NodeProperty::builder() 链补 .build()
+    for point in _find_build_insertion_points(content):
+        if not in_block(point):
+            edits.append((point, point, b".build()"))
+
+    return edits
+
+
+# 增量缓存文件：记录 path -> 处理后内容的 sha256，脚本反复运行
+# （例如挂在 pre-commit 里）时已迁移的文件按哈希直接跳过。
+# 缓存固定放在解析后的 src_root 旁边，从不同 cwd 运行共享同一份
+_CACHE_FILENAME = ".fix_node_cache.json"
+
+# 进程池 worker 里的缓存副本，由 _init_worker 注入
+_worker_cache = {}
+
+
+def _init_worker(cache: dict, verbose: bool):
+    global _worker_cache
+    _worker_cache = cache
+    handler = _setup_logging(verbose)
+    # 进程池子进程退出时不经过 atexit，注册终结器把缓冲中的日志刷出
+    Finalize(None, handler.flush, exitpriority=10)
+
+
+def _load_cache(cache_path: str) -> dict:
+    try:
+        with open(cache_path, "rb") as f:
+            cache = json.loads(f.read())
+        return cache if isinstance(cache, dict) else {}
+    except (IOError, ValueError):
+        return {}
+
+
+def _save_cache(cache_path: str, cache: dict):
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    except IOError as e:
+        log.error(f"错误: 无法写入缓存文件 '{cache_path}'。原因: {e}")
+
+
+def _process_file(file_path: str) -> tuple:
+    """供进程池调用：返回 (路径, 是否修改, 处理后内容的 sha256)。"""
+    changed, digest = fix_node_definition_file(file_path, _worker_cache.get(file_path))
+    return file_path, changed, digest
+
+
+def fix_node_definition_file(file_path: str, cached_hash: str = None) -> tuple:
+    """
+    将单个 Rust 文件中旧式的 NodeDefinition 构建代码迁移到新 API。
+
+    迁移规则:
+    1. 移除 `.version(...)`（版本改由 `NodeDefinition::new` 第三个参数提供）
+    2. `.inputs([...])` 改写为 `.add_input(...)`
+    3. `.outputs([...])` 改写为 `.add_output(...)`
+    4. `.properties([p1, p2, ...])` 展开为链式 `.add_property(p1).add_property(p2)...`
+    5. `NodePropertyKindOptions::builder()` 链末尾补齐 `.build()`
+    6. `NodeProperty::builder()` 链末尾补齐 `.build()`
+    7. `let definition = base?;` 去掉 `?`（builder 不再返回 Result）
+    8. `NodeDefinition::new("a", "b")` 补上 `Version::new(1, 0, 0)` 参数
+
+    :param file_path: 要修复的 .rs 文件路径。
+    :param cached_hash: 上次运行记录的内容 sha256，命中则直接跳过。
+    :return: (是否修改, 当前内容的 sha256) 元组。
+    """
+    try:
+        # read_bytes 按 fstat 大小一次读完，没有文本模式的增量解码和
+        # 换行转换，也不经过分块缓冲层
+        raw = Path(file_path).read_bytes()
+    except IOError as e:
+        log.error(f"错误: 无法读取文件 '{file_path}'。原因: {e}")
+        return False, None
+
+    # 增量跳过：内容哈希与上次运行一致时，连预检和正则都不用跑
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached_hash == digest:
+        return False, digest
+
+    # 预检：多数文件不含任何待迁移标记，用 C 级子串搜索直接跳过，
+    # 避免为它们跑满 8 个正则/扫描步骤
+    if not any(token in raw for token in _SENTINEL_TOKENS):
+        return False, digest
+
+    # 全部 8 个步骤统一收集编辑区间，对原始内容只重建一次
+    content = _apply_edits(raw, _collect_edits(raw))
+
+    if content == raw:
+        return False, digest
+
+    # 原子写入：写到同目录的临时文件，fsync 落盘后 os.replace 原地换名。
+    # 运行中途被打断也不会留下半写的 .rs 文件让下次运行误读
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except IOError as e:
+        log.error(f"错误: 无法写入文件 '{file_path}'。原因: {e}")
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return False, None
+
+    log.info(f"已修复: {file_path}")
+    return True, hashlib.sha256(content).hexdigest()
+
+
+def _iter_rs(root: str):
+    """递归遍历 root，惰性产出所有 .rs 文件路径。
+
+    基于 os.scandir：类型判断直接复用 DirEntry 缓存的信息，
+    不用像 os.walk 那样额外 stat，也不在内存里囤积完整文件列表。
+    """
+    for entry in os.scandir(root):
+        if entry.is_dir(follow_symlinks=False):
+            yield from _iter_rs(entry.path)
+        elif entry.name.endswith(".rs"):
+            yield entry.path
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "-v"]
+    verbose = len(args) != len(sys.argv) - 1
+    _setup_logging(verbose)
+
+    src_root = args[0] if args else "src"
+    # scandir 对不存在的根目录会抛 FileNotFoundError，先校验给出友好报错
+    if not os.path.isdir(src_root):
+        log.error(f"错误: 源码目录 '{src_root}' 不存在或不是目录。")
+        logging.shutdown()
+        sys.exit(1)
+
+    # 路径统一转成绝对路径：缓存键不再随调用 cwd 变化
+    src_root = os.path.abspath(src_root)
+    cache_path = os.path.join(os.path.dirname(src_root), _CACHE_FILENAME)
+    cache = _load_cache(cache_path)
+    total_count = 0
+    fixed_count = 0
+    # 每个文件的修复是纯 CPU 的独立工作，按进程并行铺满所有核心；
+    # chunksize 把多个文件打包成一次 IPC，摊薄任务分发开销
+    with ProcessPoolExecutor(initializer=_init_worker, initargs=(cache, verbose)) as executor:
+        for file_path, changed, digest in executor.map(_process_file, _iter_rs(src_root), chunksize=16):
+            total_count += 1
+            if changed:
+                fixed_count += 1
+            if digest is not None:
+                cache[file_path] = digest
+
+    _save_cache(cache_path, cache)
+    logging.shutdown()
+    print(f"共检查 {total_count} 个文件，修复 {fixed_count} 个。")
+
+
+# --- 主程序入口 ---
+# uv run scripts/py-tools/fix_node_definitions.py [src-root]
+if __name__ == "__main__":
+    main()